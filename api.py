@@ -27,6 +27,7 @@ import datetime
 import httplib
 import json
 import logging
+import math
 import os
 import smtplib
 import socket
@@ -34,7 +35,7 @@ import sys
 import thread, threading
 import time
 import urllib2
-from collections import deque
+from collections import deque, namedtuple
 from email.MIMEMultipart import MIMEMultipart
 from email.MIMEText import MIMEText
 
@@ -43,12 +44,21 @@ package_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.insert(0, package_path)
 
 # Import your package (if any) below
+import detector
+import feed
+import levels
+import movers
 
 log = logging.getLogger(__name__)
 
+# Immutable view of the price history published after each poll, readers in
+# other threads (e.g. query.py) only ever see a complete snapshot
+Snapshot = namedtuple('Snapshot', ['exchange', 'time', 'tickers'])
+TickerWindow = namedtuple('TickerWindow', ['prices', 'times', 'min', 'max', 'percent_change', 'zscore', 'ewma_zscore', 'volume'])
+
 
 class API(threading.Thread):
-    def __init__(self, url, my_tickers=None, number_of_prices_to_track=30, wait_before_poll=10, percent_limit=30, time_limit=0):
+    def __init__(self, url, my_tickers=None, number_of_prices_to_track=30, wait_before_poll=10, percent_limit=30, time_limit=0, detector_mode='percent', zscore_limit=4, min_samples=30, ewma_alpha=0.05, digest=False, digest_size=10):
         '''
         param: url
         param: tickers: a list of tickers to monitor
@@ -56,6 +66,12 @@ class API(threading.Thread):
         param: wait_before_poll: amount of time (in seconds) to wait before each poll
         param: percent_limit: the percentage change within time_limit before sending out notifications
         param: time_limit: amount of time back (in seconds) to calculate each price percentage change
+        param: detector_mode: "percent" to look at min/max price moves, "zscore" to look at moves beyond zscore_limit standard deviations
+        param: zscore_limit: number of standard deviations before sending out notifications
+        param: min_samples: number of price moves of a ticker before its z-score is trusted
+        param: ewma_alpha: weight of the newest price move in the EWMA volatility, also applied to the existing tickers when changed in the .ini
+        param: digest: send one email ranking the top movers per poll instead of one email per ticker
+        param: digest_size: number of top gainers and top losers in the digest
         '''
         if isinstance(my_tickers, str):
             my_tickers = [my_tickers]
@@ -68,11 +84,41 @@ class API(threading.Thread):
         self.wait_before_poll = wait_before_poll
         self.percent_limit = percent_limit
         self.time_limit = time_limit
+        self.detector_mode = detector_mode
+        self.zscore_limit = zscore_limit
+        self.min_samples = min_samples
+        self.ewma_alpha = ewma_alpha
+        if not detector.valid_alpha(ewma_alpha):
+            log.warning('Invalid setting, ewma_alpha {} is not greater than 0 and up to 1, using 0.05!'.format(ewma_alpha))
+            self.ewma_alpha = 0.05
+        self.digest = digest
+        self.digest_size = digest_size
         self.verbose = False
+
+        # What the thread is busy with, reported by profiler.py
+        self.stage = 'init'
+
+        # Top movers index for each window (in seconds), None to rebuild on the next poll
+        self.movers_windows = [time_limit]
+        self.movers = None
+
+        # Change feed published to local subscribers, see feed_socket in the .ini
+        self.feed = None
+        # Path the feed failed to start on, not retried until feed_socket changes
+        self.feed_failed_path = None
+
+        # Rolling statistics per ticker, created before the config so ewma_alpha can be applied to them
+        self.tickers_stats = {}
+
         self.config = self.import_config('{}.ini'.format(self.exchange))
 
         self.tickers_price_history = {}
         self.price_time = {}
+        self.updated_tickers = []
+        self.snapshot = Snapshot(self.exchange, None, {})
+
+        # Absolute price level alerts, see <exchange>_levels.ini
+        self.price_levels = levels.PriceLevels()
 
         # Get gmail authentication from environmental variables
         # Make sure to set GMAIL and GMAIL_PASS in the .bashrc
@@ -87,73 +133,59 @@ class API(threading.Thread):
             print('Thread {} started...'.format(self.exchange))
             while not self.stop:
                 log.debug('Waiting for {}s before next price poll...'.format(self.wait_before_poll))
+                self.stage = 'sleep'
                 time.sleep(self.wait_before_poll)
 
                 # Import config
+                self.stage = 'config'
                 self.config = self.import_config('{}.ini'.format(self.exchange))
                 log.debug('number of prices: {}, wait before poll: {}s, percent limit: {}%, time limit: {} secs, tickers: {}'.format(self.number_of_prices_to_track, self.wait_before_poll, self.percent_limit, self.time_limit, self.my_tickers))
 
                 # Get new prices
                 log.debug('Get price updates')
+                self.stage = 'fetch'
                 try:
                     my_tickers_price_history, my_price_time = self.get_prices(self.my_tickers)
                 except (httplib.BadStatusLine, httplib.IncompleteRead, socket.error, urllib2.HTTPError, urllib2.URLError) as e:
                     log.warning('Unable to get price from exchange because of {0}!'.format(e.__class__.__name__))
                     continue  # Skip the rest of the loop below and poll again
 
-                for t, p in my_tickers_price_history.items():
-                    # Convert collections.deque to list
-                    p = list(p)
-                    # log.debug(p)
-                    p_time = list(self.price_time[t])
-                    # log.debug(p_time)
-                    
-                    # Go to next item if no price in the ticker
-                    if not p:
-                        continue
-
-                    # Get min and max price index in each ticker's prices
-                    min_price_index = len(p) - 1 - p[::-1].index(min(p))
-                    max_price_index = len(p) - 1 - p[::-1].index(max(p))
-
-                    # Assign old and new price
-                    old_price = 0
-                    new_price = 0
-                    old_price_time = None
-                    new_price_time = None
-                    if min_price_index < max_price_index:
-                        old_price = p[min_price_index]
-                        old_price_time = p_time[min_price_index]
-                        new_price = p[max_price_index]
-                        new_price_time = p_time[max_price_index]
-                    else:
-                        old_price = p[max_price_index]
-                        old_price_time = p_time[max_price_index]
-                        new_price = p[min_price_index]
-                        new_price_time = p_time[min_price_index]
-
-                    # Calculate price fluctuation
-                    percent_diff = 0
-                    if old_price:
-                        percent_diff = (new_price / old_price - 1) * 100
-                    # new_price_time = new_price_time.replace(microsecond=0)  # Do not display microsecond
-                    # old_price_time = old_price_time.replace(microsecond=0)  # Do not display microsecond
-                    time_delta = new_price_time - old_price_time
-
-                    if abs(percent_diff) > self.percent_limit:
-                        if not self.time_limit or (time_delta.days == 0 and time_delta.seconds < self.time_limit):
-                            # Compose all the messages into email content
-                            email_content = self.compose_message(t, percent_diff, old_price, new_price, time_delta, self.config['percent_limit'], self.verbose)
-                            log.debug(email_content)
-                            if 'email' in self.config.keys():
-                                self.send_email(self.config['email'].strip(), '{} Update'.format(self.exchange), email_content)
-                                time.sleep(.01)
-                            else:
-                                log.warning('No email provided in the {}.ini'.format(self.exchange))
-
-                            # Clear the ticker prices to start fresh to prevent script from keep sending message
-                            self.tickers_price_history[t].clear()
-                            self.price_time[t].clear()
+                # Fire the price levels crossed in this poll
+                self.stage = 'levels'
+                self.check_price_levels()
+
+                # Rank the tickers which changed in this poll
+                self.stage = 'movers'
+                if self.movers is None:
+                    self.movers = dict((w, movers.MoversIndex(w)) for w in self.movers_windows)
+                    self.update_movers(my_tickers_price_history.keys())
+                else:
+                    # Plus the tickers whose window slid past their oldest price
+                    changed_tickers = set(t for t in self.updated_tickers if t in my_tickers_price_history)
+                    now = datetime.datetime.now()
+                    for index in self.movers.values():
+                        changed_tickers.update(index.expired(now))
+                    self.update_movers(changed_tickers)
+
+                # Look for abnormal price moves
+                self.stage = 'detection'
+                if self.detector_mode == 'zscore':
+                    alerted_tickers = self.detect_anomalies(my_tickers_price_history)
+                else:
+                    alerted_tickers = self.detect_percent_moves(my_tickers_price_history)
+
+                # Send one ranked email for all the tickers alerted in this poll
+                if self.digest and alerted_tickers:
+                    email_content = self.compose_digest(alerted_tickers)
+                    log.debug(email_content)
+                    self.notify(email_content)
+
+                # Tickers cleared after the alert drop out of the ranking
+                self.update_movers(alerted_tickers)
+
+                # Publish the tickers which changed in this poll for readers in other threads
+                self.stage = 'publish'
+                self.publish_snapshot(self.updated_tickers + alerted_tickers)
 
         except Exception as e:
             # Catch all python exceptions occurred in the main thread to log for
@@ -171,22 +203,274 @@ class API(threading.Thread):
             # Send Ctrl-C to main thread when exception happens in child thread
             thread.interrupt_main()
         finally:
+            self.stage = 'ended'
+            if self.feed:
+                self.feed.close()
+                self.feed = None
             log.info('Thread {} ended...'.format(self.exchange))
             print('Thread {} ended...'.format(self.exchange))
 
-    def get_prices(self, all_tickers, ticker_key, price_key, my_tickers=None):
+    def detect_percent_moves(self, my_tickers_price_history):
+        '''Send notifications for tickers which moved more than percent_limit
+        between the min and max price in the tracked history
+
+        param: my_tickers_price_history: price history of the tickers of interest
+        return: the tickers which were notified
+        '''
+        alerted_tickers = []
+        for t, p in my_tickers_price_history.items():
+            # Convert collections.deque to list
+            p = list(p)
+            # log.debug(p)
+            p_time = list(self.price_time[t])
+            # log.debug(p_time)
+            
+            # Go to next item if no price in the ticker
+            if not p:
+                continue
+
+            # Get min and max price index in each ticker's prices
+            min_price_index = len(p) - 1 - p[::-1].index(min(p))
+            max_price_index = len(p) - 1 - p[::-1].index(max(p))
+
+            # Assign old and new price
+            old_price = 0
+            new_price = 0
+            old_price_time = None
+            new_price_time = None
+            if min_price_index < max_price_index:
+                old_price = p[min_price_index]
+                old_price_time = p_time[min_price_index]
+                new_price = p[max_price_index]
+                new_price_time = p_time[max_price_index]
+            else:
+                old_price = p[max_price_index]
+                old_price_time = p_time[max_price_index]
+                new_price = p[min_price_index]
+                new_price_time = p_time[min_price_index]
+
+            # Calculate price fluctuation
+            percent_diff = 0
+            if old_price:
+                percent_diff = (new_price / old_price - 1) * 100
+            # new_price_time = new_price_time.replace(microsecond=0)  # Do not display microsecond
+            # old_price_time = old_price_time.replace(microsecond=0)  # Do not display microsecond
+            time_delta = new_price_time - old_price_time
+
+            if abs(percent_diff) > self.percent_limit:
+                if not self.time_limit or (time_delta.days == 0 and time_delta.seconds < self.time_limit):
+                    # Compose all the messages into email content
+                    email_content = self.compose_message(t, percent_diff, old_price, new_price, time_delta, self.config['percent_limit'], self.verbose)
+                    log.debug(email_content)
+                    if not self.digest:
+                        self.notify(email_content)
+
+                    # Clear the ticker prices to start fresh to prevent script from keep sending message
+                    self.tickers_price_history[t].clear()
+                    self.price_time[t].clear()
+                    alerted_tickers.append(t)
+        return alerted_tickers
+
+    def detect_anomalies(self, my_tickers_price_history):
+        '''Send notifications for tickers whose latest move is more than
+        zscore_limit standard deviations away from their rolling statistics
+
+        Only the tickers updated in the latest poll are checked, the rolling
+        statistics are already up to date from get_prices.
+
+        param: my_tickers_price_history: price history of the tickers of interest
+        return: the tickers which were notified
+        '''
+        alerted_tickers = []
+        for t in self.updated_tickers:
+            if t not in my_tickers_price_history or t not in self.tickers_stats:
+                continue
+            stats = self.tickers_stats[t]
+            if not stats.is_anomaly(self.zscore_limit, self.min_samples):
+                continue
+
+            new_price = stats.last_price
+            old_price = new_price / math.exp(stats.last_return)
+            percent_diff = (math.exp(stats.last_return) - 1) * 100
+            time_delta = datetime.timedelta(0)
+            if len(self.price_time[t]) > 1:
+                time_delta = self.price_time[t][-1] - self.price_time[t][-2]
+
+            # Compose all the messages into email content
+            email_content = self.compose_message(t, percent_diff, old_price, new_price, time_delta, None, self.verbose)
+            email_content += 'z-score:       {:+.2f} (ewma {:+.2f}), zscore_limit: {}<br />'.format(stats.zscore, stats.ewma_zscore, self.zscore_limit)
+            if stats.last_volume is not None:
+                email_content += 'volume:        {:.8f} (z-score {:+.2f})<br />'.format(stats.last_volume, stats.volume_zscore)
+            log.debug(email_content)
+            if not self.digest:
+                self.notify(email_content)
+            alerted_tickers.append(t)
+        return alerted_tickers
+
+    def update_movers(self, tickers):
+        '''Update the top movers index of each window for the given tickers
+
+        param: tickers: tickers whose price history changed
+        '''
+        now = datetime.datetime.now()
+        for t in tickers:
+            prices = self.tickers_price_history.get(t)
+            if not prices:
+                for index in self.movers.values():
+                    index.remove(t)
+                continue
+            start_prices = movers.window_start_prices(prices, self.price_time[t], now, self.movers.keys())
+            for w, index in self.movers.items():
+                start_price, start_time = start_prices[w]
+                if start_price:
+                    index.update(t, (prices[-1] / start_price - 1) * 100, start_time)
+                else:
+                    index.remove(t)
+
+    def top_movers(self, n, window=None):
+        '''Top n gainers and losers over the window
+
+        param: n: number of gainers and losers
+        param: window: window in seconds, one of movers_windows, the first one if None
+        return: list of gainers and list of losers, as (ticker, percent change)
+        '''
+        if not self.movers:
+            return [], []
+        if window is None:
+            window = self.movers_windows[0]
+        index = self.movers[window]
+        return index.gainers(n), index.losers(n)
+
+    def compose_digest(self, alerted_tickers):
+        '''Compose one email ranking the top movers of every window
+
+        param: alerted_tickers: tickers which triggered the alert in this poll, marked with *
+        '''
+        log.info('{}: {} tickers alerted, sending top movers digest'.format(self.exchange, len(alerted_tickers)))
+        message = '{} top movers, {} tickers alerted<br />'.format(self.exchange, len(alerted_tickers))
+        for w in self.movers_windows:
+            gainers, losers = self.top_movers(self.digest_size, w)
+            window = 'last {}'.format(datetime.timedelta(seconds=w)) if w else 'tracked history'
+            message += '==========<br />'
+            message += 'Top gainers over {}<br />'.format(window)
+            for t, percent_change in gainers:
+                message += '{}{}: <font color="green">{:+.2f}%</font><br />'.format(t, ' *' if t in alerted_tickers else '', percent_change)
+            message += 'Top losers over {}<br />'.format(window)
+            for t, percent_change in losers:
+                message += '{}{}: <font color="red">{:+.2f}%</font><br />'.format(t, ' *' if t in alerted_tickers else '', percent_change)
+        message += '==========<br />'
+        message += 'Alerted: {}<br />'.format(', '.join(alerted_tickers))
+        message += 'percent_limit: {}%<br />'.format(self.percent_limit)
+        message += 'Time sent:     {}<br />'.format(datetime.datetime.now().strftime('%Y-%m-%d %I:%M:%S %p'))
+        message += '<br />'
+        return message
+
+    def publish_snapshot(self, changed_tickers):
+        '''Publish a new snapshot of the price history
+
+        The snapshot is copy-on-write, only the windows of the changed tickers
+        are copied, the others are shared with the previous snapshot.  The
+        snapshot is swapped in with a single assignment so readers never need
+        a lock.
+
+        param: changed_tickers: tickers whose price history changed since the previous snapshot
+        '''
+        tickers = dict(self.snapshot.tickers)
+        for t in changed_tickers:
+            prices = tuple(self.tickers_price_history[t])
+            times = tuple(self.price_time[t])
+            stats = self.tickers_stats[t]
+            percent_change = 0
+            if prices and prices[0]:
+                percent_change = (prices[-1] / prices[0] - 1) * 100
+            tickers[t] = TickerWindow(
+                prices, times,
+                min(prices) if prices else None,
+                max(prices) if prices else None,
+                percent_change, stats.zscore, stats.ewma_zscore, stats.last_volume)
+        self.snapshot = Snapshot(self.exchange, datetime.datetime.now(), tickers)
+
+    def add_price_level(self, ticker, level):
+        '''Send a notification when the price of ticker crosses level, return the alert id'''
+        return self.price_levels.add(ticker, level)
+
+    def remove_price_level(self, alert_id):
+        return self.price_levels.remove(alert_id)
+
+    def check_price_levels(self):
+        '''Send one notification with all the price levels crossed by the tickers updated in the latest poll'''
+        self.price_levels.load('{}_levels.ini'.format(self.exchange))
+
+        # Every updated ticker goes through update() so the previous price is known when a level is added
+        message = ''
+        for t in self.updated_tickers:
+            previous_price = self.price_levels.last_prices.get(t)
+            new_price = self.tickers_price_history[t][-1]
+            crossed = self.price_levels.update(t, new_price)
+            if crossed:
+                message += self.compose_level_message(t, previous_price, new_price, [level for level, _ in crossed])
+        if message:
+            log.debug(message)
+            self.notify(message)
+
+    def compose_level_message(self, ticker, old_price, new_price, crossed_levels):
+        '''Compose email message for the price levels crossed by one ticker.'''
+        log.info('{0}: crossed {1}, old price: {2:.8f}, new price: {3:.8f}'.format(ticker, ', '.join('{:.8f}'.format(l) for l in crossed_levels), old_price, new_price))
+        color = 'green' if new_price > old_price else 'red'
+        direction = 'above' if new_price > old_price else 'below'
+        message = '{}: <font color="{}">{} {}</font><br />'.format(ticker, color, direction, ', '.join('{:.8f}'.format(l) for l in crossed_levels))
+        message += 'old price:     {:.8f}<br />'.format(old_price)
+        message += 'new price:     {:.8f}<br />'.format(new_price)
+        message += 'Time sent:     {}<br />'.format(datetime.datetime.now().strftime('%Y-%m-%d %I:%M:%S %p'))
+        message += '<br />'
+        return message
+
+    def notify(self, email_content):
+        '''Send the email content to the recipients in the config'''
+        if 'email' in self.config.keys():
+            stage = self.stage
+            self.stage = 'send_email'
+            self.send_email(self.config['email'].strip(), '{} Update'.format(self.exchange), email_content)
+            time.sleep(.01)
+            self.stage = stage
+        else:
+            log.warning('No email provided in the {}.ini'.format(self.exchange))
+
+    def fetch_json(self, request):
+        '''Fetch and decode a JSON response from the exchange
+
+        A truncated or malformed response is raised as httplib.IncompleteRead
+        so it is handled like the other fetch errors.
+
+        param: request: URL or urllib2.Request
+        '''
+        response = urllib2.urlopen(request).read()
+        try:
+            return json.loads(response)
+        except ValueError:
+            raise httplib.IncompleteRead(response)
+
+    def get_prices(self, all_tickers, ticker_key, price_key, my_tickers=None, volume_key=None):
         '''Get all prices from URL specified in the class
 
         param: all_tickers: a list of all the tickers in dictionary form with at least ticker and price key value pair
         param: ticker_key: name used to indicate the ticker field
         param: price_key: name used to indicate the price field
         param: my_tickers: tickers of interest
+        param: volume_key: name used to indicate the volume field, if the exchange provides one
         '''
         if isinstance(all_tickers, str):
             all_tickers = [all_tickers]
         if isinstance(my_tickers, str):
             my_tickers = [my_tickers]
 
+        # The exchange has answered, the rest is parsing and ingesting
+        self.stage = 'get_prices'
+
+        # Tickers with a new price in this poll
+        self.updated_tickers = []
+        poll_time = datetime.datetime.now()
+
         if all_tickers:
             for t in all_tickers:
                 # Track the prices for all tickers
@@ -196,10 +480,27 @@ class API(threading.Thread):
                 if t[ticker_key] in self.tickers_price_history.keys():
                     if not self.tickers_price_history[t[ticker_key]] or not float(t[price_key]) == self.tickers_price_history[t[ticker_key]][-1]:
                         self.tickers_price_history[t[ticker_key]].append(float(t[price_key]))
-                        self.price_time[t[ticker_key]].append(datetime.datetime.now())
+                        self.price_time[t[ticker_key]].append(poll_time)
+                        self.updated_tickers.append(t[ticker_key])
                 else:
                     self.tickers_price_history[t[ticker_key]] = deque([float(t[price_key])], self.number_of_prices_to_track)
-                    self.price_time[t[ticker_key]] = deque([datetime.datetime.now()], self.number_of_prices_to_track)
+                    self.price_time[t[ticker_key]] = deque([poll_time], self.number_of_prices_to_track)
+                    self.tickers_stats[t[ticker_key]] = detector.RollingStats(self.ewma_alpha)
+                    self.updated_tickers.append(t[ticker_key])
+
+                # Update the rolling statistics incrementally, only when the price or volume changed
+                stats = self.tickers_stats[t[ticker_key]]
+                if not float(t[price_key]) == stats.last_price:
+                    stats.update_price(float(t[price_key]))
+                if volume_key and volume_key in t.keys():
+                    try:
+                        stats.update_volume(float(t[volume_key]))
+                    except (TypeError, ValueError):
+                        pass
+
+        # Publish only the tickers whose price changed in this poll
+        if self.feed and self.updated_tickers:
+            self.feed.publish(self.exchange, poll_time, dict((t, self.tickers_price_history[t][-1]) for t in self.updated_tickers))
 
         if my_tickers:
             # Get only tickers that match my_tickers
@@ -257,11 +558,15 @@ class API(threading.Thread):
                     log.setLevel(logging.INFO)
 
             # Get my_tickers
+            my_tickers = self.my_tickers
             if 'my_tickers' in config.keys():
                 if config['my_tickers'] == "":
                     self.my_tickers = None
                 else:
                     self.my_tickers = [t.strip() for t in config['my_tickers'].split(',')]
+                if self.my_tickers != my_tickers:
+                    # Rebuild the top movers index for the new tickers
+                    self.movers = None
 
             # Get number_of_prices_to_track
             if 'number_of_prices_to_track' in config.keys():
@@ -277,6 +582,70 @@ class API(threading.Thread):
                 except ValueError:
                     log.warning('Invalid setting, "wait_before_poll" in {}.ini is not an integer!'.format(self.exchange))
 
+            # Get detector, "percent" (default) or "zscore"
+            if 'detector' in config.keys():
+                if config['detector'] in ('percent', 'zscore'):
+                    self.detector_mode = config['detector']
+                elif config['detector']:
+                    log.warning('Invalid setting, "detector" in {}.ini is not "percent" or "zscore"!'.format(self.exchange))
+
+            # Get zscore_limit, default is 4
+            if 'zscore_limit' in config.keys():
+                try:
+                    self.zscore_limit = float(config['zscore_limit'])
+                except ValueError:
+                    log.warning('Invalid setting, "zscore_limit" in {}.ini is not a float!'.format(self.exchange))
+
+            # Get min_samples, default is 30
+            if 'min_samples' in config.keys():
+                try:
+                    self.min_samples = int(config['min_samples'])
+                except ValueError:
+                    log.warning('Invalid setting, "min_samples" in {}.ini is not an integer!'.format(self.exchange))
+
+            # Get ewma_alpha, default is 0.05
+            if 'ewma_alpha' in config.keys():
+                try:
+                    ewma_alpha = float(config['ewma_alpha'])
+                    if not detector.valid_alpha(ewma_alpha):
+                        log.warning('Invalid setting, "ewma_alpha" in {}.ini is not greater than 0 and up to 1!'.format(self.exchange))
+                    elif ewma_alpha != self.ewma_alpha:
+                        # Apply to the tickers already tracked, not only the new ones
+                        self.ewma_alpha = ewma_alpha
+                        for stats in self.tickers_stats.values():
+                            stats.volatility.alpha = ewma_alpha
+                except ValueError:
+                    log.warning('Invalid setting, "ewma_alpha" in {}.ini is not a float!'.format(self.exchange))
+
+            # Get feed_socket, the change feed is disabled when blank
+            if 'feed_socket' in config.keys():
+                self.set_feed(config['feed_socket'])
+
+            # Get digest, default is False
+            if 'digest' in config.keys():
+                if config['digest'] == 'True':
+                    self.digest = True
+                else:
+                    self.digest = False
+
+            # Get digest_size, default is 10
+            if 'digest_size' in config.keys():
+                try:
+                    self.digest_size = int(config['digest_size'])
+                except ValueError:
+                    log.warning('Invalid setting, "digest_size" in {}.ini is not an integer!'.format(self.exchange))
+
+            # Get movers_windows (in seconds), default is time_limit
+            movers_windows = [self.time_limit]
+            if 'movers_windows' in config.keys() and config['movers_windows']:
+                try:
+                    movers_windows = [int(w) for w in config['movers_windows'].split(',')]
+                except ValueError:
+                    log.warning('Invalid setting, "movers_windows" in {}.ini is not a list of integers (in seconds)!'.format(self.exchange))
+            if movers_windows != self.movers_windows:
+                self.movers_windows = movers_windows
+                self.movers = None
+
             # Get verbosity for email message
             if 'verbose' in config.keys():
                 if config['verbose'] == 'True':
@@ -292,15 +661,45 @@ class API(threading.Thread):
                 f.write('my_tickers=\n')
                 f.write('wait_before_poll={}\n'.format(self.wait_before_poll))
                 f.write('verbose=False\n')
+                f.write('detector={}\n'.format(self.detector_mode))
+                f.write('zscore_limit={}\n'.format(self.zscore_limit))
+                f.write('min_samples={}\n'.format(self.min_samples))
+                f.write('ewma_alpha={}\n'.format(self.ewma_alpha))
+                f.write('feed_socket=\n')
+                f.write('digest={}\n'.format(self.digest))
+                f.write('digest_size={}\n'.format(self.digest_size))
+                f.write('movers_windows=\n')
         log.debug(config)
         return config
 
+    def set_feed(self, path):
+        '''Start, move or stop the change feed
+
+        param: path: path of the Unix domain socket, stop the feed if blank
+        '''
+        if self.feed and self.feed.path == path:
+            return
+        if not self.feed and path == self.feed_failed_path:
+            return
+        if self.feed:
+            self.feed.close()
+            self.feed = None
+        self.feed_failed_path = None
+        if path:
+            try:
+                self.feed = feed.ChangeFeed(path, self.exchange)
+            except (OSError, socket.error) as e:
+                log.warning('Unable to start change feed on {} because of {}, change feed_socket to retry!'.format(path, e))
+                self.feed_failed_path = path
+
     def compose_message(self, ticker, percent_diff, old_price, new_price, time_delta, percent_limit, verbose=False):
         '''Compose email message.
 
         Reserved for child class to implement
+
+        param: percent_limit: limit the move went past, None when the alert is not about percent_limit
         '''
-        log.info('{0}: {1:+.2f}%, old price: {2:.8f}, new price: {3:.8f}, time_delta: {4}, percent_limit: {5}%'.format(ticker, percent_diff, old_price, new_price, time_delta, percent_limit))
+        log.info('{0}: {1:+.2f}%, old price: {2:.8f}, new price: {3:.8f}, time_delta: {4}, percent_limit: {5}'.format(ticker, percent_diff, old_price, new_price, time_delta, '{}%'.format(percent_limit) if percent_limit is not None else None))
         message = ''
         if verbose:
             message += '==========<br />'
@@ -366,7 +765,7 @@ class Binance(API):
         if isinstance(my_tickers, str):
             my_tickers = [my_tickers]
 
-        all_tickers = json.loads(urllib2.urlopen(self.url).read())
+        all_tickers = self.fetch_json(self.url)
         return super(Binance, self).get_prices(all_tickers, 'symbol', 'price', my_tickers=my_tickers)
 
     def compose_message(self, ticker, percent_diff, old_price, new_price, time_delta, percent_limit, verbose=False):
@@ -383,7 +782,8 @@ class Binance(API):
         message += '{}: <font color="{}">{:+.2f}%</font> in {}<br />'.format(ticker, color, percent_diff, str(time_delta))
         message += 'old price:     {:.8f}<br />'.format(old_price)
         message += 'new price:     {:.8f}<br />'.format(new_price)
-        message += 'percent_limit: {}%<br />'.format(percent_limit)
+        if percent_limit is not None:
+            message += 'percent_limit: {}%<br />'.format(percent_limit)
         message += 'Time sent:     {}<br />'.format(datetime.datetime.now().strftime('%Y-%m-%d %I:%M:%S %p'))
         # message += '    '  # Spaces after the message are needed for display purposes when text is received
         message += '<br />'
@@ -405,8 +805,8 @@ class Bittrex(API):
         if isinstance(my_tickers, str):
             my_tickers = [my_tickers]
 
-        all_tickers = json.loads(urllib2.urlopen(self.url).read())['result']
-        return super(Bittrex, self).get_prices(all_tickers, 'MarketName', 'Last', my_tickers=my_tickers)
+        all_tickers = self.fetch_json(self.url)['result']
+        return super(Bittrex, self).get_prices(all_tickers, 'MarketName', 'Last', my_tickers=my_tickers, volume_key='BaseVolume')
 
     def compose_message(self, ticker, percent_diff, old_price, new_price, time_delta, percent_limit, verbose=False):
         '''Compose email message.'''
@@ -417,7 +817,8 @@ class Bittrex(API):
         message += '{}: <font color="{}">{:+.2f}%</font> in {}<br />'.format(ticker, color, percent_diff, str(time_delta))
         message += 'old price:     {:.8f}<br />'.format(old_price)
         message += 'new price:     {:.8f}<br />'.format(new_price)
-        message += 'percent_limit: {}%<br />'.format(percent_limit)
+        if percent_limit is not None:
+            message += 'percent_limit: {}%<br />'.format(percent_limit)
         message += 'Time sent:     {}<br />'.format(datetime.datetime.now().strftime('%Y-%m-%d %I:%M:%S %p'))
         # message += '    '  # Spaces after the message are needed for display purposes when text is received
         message += '<br />'
@@ -449,10 +850,10 @@ class Idex(API):
             'Connection': 'keep-alive'}
         )
         all_tickers = []
-        for key, value in json.loads(urllib2.urlopen(req).read()).items():
+        for key, value in self.fetch_json(req).items():
             value['symbol'] = key
             all_tickers.append(value)
-        return super(Idex, self).get_prices(all_tickers, 'symbol', 'last', my_tickers=my_tickers)
+        return super(Idex, self).get_prices(all_tickers, 'symbol', 'last', my_tickers=my_tickers, volume_key='baseVolume')
 
     def compose_message(self, ticker, percent_diff, old_price, new_price, time_delta, percent_limit, verbose=False):
         '''Compose email message.'''
@@ -463,7 +864,8 @@ class Idex(API):
         message += '{}: <font color="{}">{:+.2f}%</font> in {}<br />'.format(ticker, color, percent_diff, str(time_delta))
         message += 'old price:     {:.8f}<br />'.format(old_price)
         message += 'new price:     {:.8f}<br />'.format(new_price)
-        message += 'percent_limit: {}%<br />'.format(percent_limit)
+        if percent_limit is not None:
+            message += 'percent_limit: {}%<br />'.format(percent_limit)
         message += 'Time sent:     {}<br />'.format(datetime.datetime.now().strftime('%Y-%m-%d %I:%M:%S %p'))
         # message += '    '  # Spaces after the message are needed for display purposes when text is received
         message += '<br />'
@@ -485,8 +887,8 @@ class Kucoin(API):
         if isinstance(my_tickers, str):
             my_tickers = [my_tickers]
 
-        all_tickers = json.loads(urllib2.urlopen(self.url).read())['data']
-        return super(Kucoin, self).get_prices(all_tickers, 'symbol', 'lastDealPrice', my_tickers=my_tickers)
+        all_tickers = self.fetch_json(self.url)['data']
+        return super(Kucoin, self).get_prices(all_tickers, 'symbol', 'lastDealPrice', my_tickers=my_tickers, volume_key='volValue')
 
     def compose_message(self, ticker, percent_diff, old_price, new_price, time_delta, percent_limit, verbose=False):
         '''Compose email message.'''
@@ -497,7 +899,8 @@ class Kucoin(API):
         message += '{}: <font color="{}">{:+.2f}%</font> in {}<br />'.format(ticker, color, percent_diff, str(time_delta))
         message += 'old price:     {:.8f}<br />'.format(old_price)
         message += 'new price:     {:.8f}<br />'.format(new_price)
-        message += 'percent_limit: {}%<br />'.format(percent_limit)
+        if percent_limit is not None:
+            message += 'percent_limit: {}%<br />'.format(percent_limit)
         message += 'Time sent:     {}<br />'.format(datetime.datetime.now().strftime('%Y-%m-%d %I:%M:%S %p'))
         # message += '    '  # Spaces after the message are needed for display purposes when text is received
         message += '<br />'
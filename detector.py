@@ -0,0 +1,152 @@
+'''This module keeps rolling statistics for each ticker to detect abnormal
+price moves.  All statistics are updated incrementally as prices are
+ingested, no price history is rescanned, so the update cost per ticker is
+constant and it can run over every ticker on every poll.
+
+Price moves are measured as log returns between two consecutive different
+prices, a move is flagged when it is more than N standard deviations away
+from what the ticker usually does.  The volume statistics are only reported
+alongside the move, they do not take part in flagging it.
+
+Welford's online algorithm for mean and variance
+Reference: https://en.wikipedia.org/wiki/Algorithms_for_calculating_variance#Welford's_online_algorithm
+
+Exponentially weighted moving variance
+Reference: https://en.wikipedia.org/wiki/Moving_average#Exponentially_weighted_moving_variance_and_standard_deviation
+'''
+import logging
+import math
+
+log = logging.getLogger(__name__)
+
+
+class Welford(object):
+    '''Running mean and variance over all the values seen so far'''
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+
+    @property
+    def variance(self):
+        if self.count < 2:
+            return 0.0
+        return self.m2 / (self.count - 1)
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def zscore(self, x):
+        std = self.std
+        if not std:
+            return 0.0
+        return (x - self.mean) / std
+
+
+def valid_alpha(alpha):
+    '''Whether alpha is a usable EWMA weight, beyond 1 the variance goes negative'''
+    return 0 < alpha <= 1
+
+
+class EWMA(object):
+    '''Exponentially weighted mean and variance, recent values weigh more'''
+    def __init__(self, alpha=0.05):
+        '''
+        param: alpha: weight of the newest value, greater than 0 and up to 1
+        '''
+        if not valid_alpha(alpha):
+            raise ValueError('EWMA alpha {} is not greater than 0 and up to 1'.format(alpha))
+        self.alpha = alpha
+        self.count = 0
+        self.mean = 0.0
+        self.variance = 0.0
+
+    def update(self, x):
+        if not self.count:
+            self.mean = x
+        else:
+            delta = x - self.mean
+            increment = self.alpha * delta
+            self.mean += increment
+            self.variance = (1 - self.alpha) * (self.variance + delta * increment)
+        self.count += 1
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    def zscore(self, x):
+        std = self.std
+        if not std:
+            return 0.0
+        return (x - self.mean) / std
+
+
+class RollingStats(object):
+    '''Rolling statistics of the price returns and volume of one ticker'''
+    def __init__(self, alpha=0.05):
+        '''
+        param: alpha: weight of the newest return in the EWMA volatility
+        '''
+        self.returns = Welford()
+        self.volatility = EWMA(alpha)
+        self.volume = Welford()
+        self.last_price = 0
+        self.last_return = 0.0
+        self.last_volume = None
+
+        # Scores of the latest move against the statistics before the move
+        self.zscore = 0.0
+        self.ewma_zscore = 0.0
+        self.volume_zscore = 0.0
+
+    def update_price(self, price):
+        '''Score the move to the new price, then fold it into the statistics
+
+        param: price: the new price, should only be called when the price changed
+        '''
+        if price <= 0:
+            # No move to score, clear the previous one so it is not flagged again
+            self.zscore = 0.0
+            self.ewma_zscore = 0.0
+            return
+        if self.last_price > 0:
+            r = math.log(price / self.last_price)
+            # Score before updating so the move does not inflate its own deviation
+            self.zscore = self.returns.zscore(r)
+            self.ewma_zscore = self.volatility.zscore(r)
+            self.returns.update(r)
+            self.volatility.update(r)
+            self.last_return = r
+        self.last_price = price
+
+    def update_volume(self, volume):
+        '''Score the new volume, then fold it into the statistics
+
+        Exchanges report a 24h running volume which repeats between trades,
+        a repeated value is ignored so it does not flatten the statistics.
+
+        param: volume: the latest volume reported by the exchange
+        '''
+        if volume == self.last_volume:
+            return
+        self.volume_zscore = self.volume.zscore(volume)
+        self.volume.update(volume)
+        self.last_volume = volume
+
+    def is_anomaly(self, zscore_limit, min_samples=30):
+        '''Whether the latest move is beyond zscore_limit standard deviations
+
+        param: zscore_limit: number of standard deviations before flagging the move
+        param: min_samples: number of returns required before the statistics are trusted
+        '''
+        if self.returns.count < min_samples:
+            return False
+        return abs(self.zscore) > zscore_limit or abs(self.ewma_zscore) > zscore_limit
@@ -0,0 +1,232 @@
+#!/usr/bin/python
+'''This module publishes the price changes of each poll to local subscribers
+over a Unix domain socket.
+
+Each message is one line of JSON, only the tickers whose price changed since
+they were last published are included, and polls without any change are not
+sent:
+
+    {"exchange":"Binance","seq":42,"time":"2018-03-01T12:00:00.123456","prices":{"XRPETH":0.00123}}
+
+The poller never blocks on a subscriber.  Every subscriber has a bounded
+buffer, when a slow subscriber lets it fill up the oldest messages are dropped
+and the subscriber receives a line reporting how many were dropped before the
+next message:
+
+    {"dropped":10}
+
+Usage:
+    Set feed_socket in <exchange>.ini to the socket path, then subscribe with
+    $ ./feed.py /tmp/binance.sock
+
+Reference: https://pymotw.com/2/socket/uds.html
+Reference: https://pymotw.com/2/select/
+'''
+import errno
+import fcntl
+import json
+import logging
+import os
+import select
+import socket
+import stat
+import sys
+import threading
+from collections import deque
+
+# Include the project package into the system path to allow import
+package_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, package_path)
+
+# Import your package (if any) below
+
+log = logging.getLogger(__name__)
+
+
+class Subscriber(object):
+    def __init__(self, connection, max_buffered):
+        self.connection = connection
+        self.buffer = deque()
+        self.max_buffered = max_buffered
+        self.pending = ''
+        self.dropped = 0
+
+
+class ChangeFeed(object):
+    def __init__(self, path, name='', max_buffered=1000):
+        '''
+        param: path: path of the Unix domain socket to listen on
+        param: name: name used in the logs, usually the exchange
+        param: max_buffered: number of messages buffered for each subscriber before dropping
+        '''
+        self.path = path
+        self.name = name
+        self.max_buffered = max_buffered
+        self.seq = 0
+        # Last published price of each ticker, a ticker re-appended at the same price is not a change
+        self.last_prices = {}
+        self.subscribers = {}
+        self.lock = threading.Lock()
+        self.stop = False
+
+        self.remove_stale_socket()
+        self.server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.server.bind(self.path)
+        # Remember which file is ours so close() never removes somebody else's
+        self.inode = os.stat(self.path).st_ino
+        self.server.listen(5)
+        self.server.setblocking(False)
+
+        # Pipe used to wake up the sender when there is something to send
+        self.wake_r, self.wake_w = os.pipe()
+        for fd in (self.wake_r, self.wake_w):
+            fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+
+        self.sender = threading.Thread(target=self._send_loop, name='{}Feed'.format(self.name))
+        self.sender.daemon = True
+        self.sender.start()
+        log.info('{} change feed listening on {}'.format(self.name, self.path))
+
+    def remove_stale_socket(self):
+        '''Remove the socket left behind by a previous run
+
+        Raise instead of removing when the path is not a socket, or when the
+        socket is still served by another feed.
+        '''
+        if not os.path.exists(self.path):
+            return
+        if not stat.S_ISSOCK(os.stat(self.path).st_mode):
+            raise OSError(errno.EEXIST, 'Not a socket, refusing to remove it', self.path)
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.path)
+        except socket.error:
+            # Nobody is listening, the socket is stale
+            os.unlink(self.path)
+            return
+        finally:
+            probe.close()
+        raise socket.error(errno.EADDRINUSE, 'Socket {} is served by another feed'.format(self.path))
+
+    def publish(self, exchange, poll_time, prices):
+        '''Queue the price changes of one poll to every subscriber, never blocks
+
+        param: exchange: name of the exchange
+        param: poll_time: datetime of the poll
+        param: prices: dictionary of ticker and new price
+        '''
+        changes = {}
+        for t, p in prices.items():
+            if self.last_prices.get(t) != p:
+                self.last_prices[t] = p
+                changes[t] = p
+        if not changes or not self.subscribers:
+            return
+
+        self.seq += 1
+        line = json.dumps({'exchange': exchange, 'seq': self.seq, 'time': poll_time.isoformat(), 'prices': changes}, separators=(',', ':')) + '\n'
+        with self.lock:
+            for s in self.subscribers.values():
+                if len(s.buffer) >= s.max_buffered:
+                    s.buffer.popleft()
+                    s.dropped += 1
+                s.buffer.append(line)
+        self._wake()
+
+    def close(self):
+        self.stop = True
+        self._wake()
+        self.sender.join()
+        with self.lock:
+            for s in self.subscribers.values():
+                s.connection.close()
+            self.subscribers = {}
+        self.server.close()
+        os.close(self.wake_r)
+        os.close(self.wake_w)
+        try:
+            if os.stat(self.path).st_ino == self.inode:
+                os.unlink(self.path)
+        except OSError:
+            pass
+        log.info('{} change feed closed'.format(self.name))
+
+    def _wake(self):
+        try:
+            os.write(self.wake_w, 'x')
+        except OSError as e:
+            # The pipe is full, the sender is already going to wake up
+            if e.errno != errno.EAGAIN:
+                raise
+
+    def _send_loop(self):
+        while not self.stop:
+            with self.lock:
+                writers = [s.connection for s in self.subscribers.values() if s.pending or s.buffer]
+            readable, writable, _ = select.select([self.server, self.wake_r], writers, [], 1)
+
+            if self.wake_r in readable:
+                try:
+                    os.read(self.wake_r, 4096)
+                except OSError:
+                    pass
+
+            if self.server in readable:
+                self._accept()
+
+            for connection in writable:
+                self._send(connection)
+
+    def _accept(self):
+        try:
+            connection, _ = self.server.accept()
+        except socket.error:
+            return
+        connection.setblocking(False)
+        with self.lock:
+            self.subscribers[connection] = Subscriber(connection, self.max_buffered)
+        log.info('{} change feed subscriber connected, {} subscribers'.format(self.name, len(self.subscribers)))
+
+    def _send(self, connection):
+        s = self.subscribers.get(connection)
+        if s is None:
+            return
+        if not s.pending:
+            with self.lock:
+                if s.dropped:
+                    log.warning('{} change feed subscriber is lagging, dropped {} messages'.format(self.name, s.dropped))
+                    s.pending = json.dumps({'dropped': s.dropped}, separators=(',', ':')) + '\n'
+                    s.dropped = 0
+                if s.buffer:
+                    s.pending += s.buffer.popleft()
+        try:
+            sent = connection.send(s.pending)
+            s.pending = s.pending[sent:]
+        except socket.error as e:
+            if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                return
+            with self.lock:
+                del self.subscribers[connection]
+            connection.close()
+            log.info('{} change feed subscriber disconnected, {} subscribers'.format(self.name, len(self.subscribers)))
+
+
+def main():
+    '''Print the messages of a change feed'''
+    if len(sys.argv) != 2:
+        print('Usage: {} <socket path>'.format(sys.argv[0]))
+        sys.exit(1)
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    client.connect(sys.argv[1])
+    try:
+        for line in client.makefile():
+            sys.stdout.write(line)
+            sys.stdout.flush()
+    except KeyboardInterrupt:
+        print('Ctrl-C entered.')
+    finally:
+        client.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+'''This module keeps absolute price level alerts, e.g. "tell me when XRPETH
+crosses 0.0012", for every ticker of an exchange.
+
+The levels of each ticker are kept in a list sorted with bisect, so a price
+update finds the levels crossed between the previous and the new price in
+O(log n + k), n being the number of levels of the ticker and k the number of
+levels crossed.  A rising price crosses the levels in (previous, new], a
+falling price crosses the levels in [new, previous).  Levels stay in place
+after firing and fire again on the next crossing.
+
+Levels can be added and removed at runtime, or listed in <exchange>_levels.ini
+which is reloaded when it changes:
+
+    # ticker=level,level,...
+    XRPETH=0.0012,0.0015
+
+Reference: https://docs.python.org/2/library/bisect.html
+'''
+import bisect
+import logging
+import os
+import threading
+
+log = logging.getLogger(__name__)
+
+
+class PriceLevels(object):
+    def __init__(self):
+        # Sorted list of (level, alert id) for each ticker
+        self.tickers = {}
+        # Ticker, level and source of each alert id
+        self.alerts = {}
+        self.last_prices = {}
+        self.next_id = 1
+        self.lock = threading.Lock()
+
+        # Levels loaded from a file are replaced when the file is reloaded
+        self.path = None
+        self.mtime = None
+
+    def __len__(self):
+        return len(self.alerts)
+
+    def add(self, ticker, level, source=None):
+        '''Add a price level alert and return its id
+
+        param: ticker: ticker to watch
+        param: level: price level
+        param: source: where the alert comes from, None for alerts added at runtime
+        '''
+        with self.lock:
+            alert_id = self.next_id
+            self.next_id += 1
+            self.alerts[alert_id] = (ticker, float(level), source)
+            bisect.insort(self.tickers.setdefault(ticker, []), (float(level), alert_id))
+        return alert_id
+
+    def remove(self, alert_id):
+        '''Remove a price level alert, return False if the id is unknown'''
+        with self.lock:
+            if alert_id not in self.alerts:
+                return False
+            ticker, level, _ = self.alerts.pop(alert_id)
+            levels = self.tickers[ticker]
+            del levels[bisect.bisect_left(levels, (level, alert_id))]
+            if not levels:
+                del self.tickers[ticker]
+        return True
+
+    def update(self, ticker, price):
+        '''Record the new price and return the levels crossed since the previous price
+
+        param: ticker: ticker whose price changed
+        param: price: the new price
+        return: list of (level, alert id) crossed, in the direction of the move
+        '''
+        if price <= 0:
+            return []
+        previous_price = self.last_prices.get(ticker)
+        self.last_prices[ticker] = price
+        if previous_price is None or previous_price == price:
+            return []
+        with self.lock:
+            levels = self.tickers.get(ticker)
+            if not levels:
+                return []
+            if price > previous_price:
+                return levels[bisect.bisect_right(levels, (previous_price, float('inf'))):bisect.bisect_right(levels, (price, float('inf')))]
+            else:
+                return levels[bisect.bisect_left(levels, (price,)):bisect.bisect_left(levels, (previous_price,))][::-1]
+
+    def load(self, path):
+        '''Load the levels from a file if it changed since the previous load
+
+        param: path: file with one ticker=level,level,... per line
+        '''
+        if not os.path.exists(path):
+            mtime = None
+        else:
+            mtime = os.path.getmtime(path)
+        if path == self.path and mtime == self.mtime:
+            return
+
+        levels = {}
+        if mtime is not None:
+            with open(path, 'r') as f:
+                for line in f:
+                    if not line.strip() or line.strip().startswith('#'):
+                        continue
+                    try:
+                        ticker, values = line.split('=')
+                        levels[ticker.strip()] = [float(v) for v in values.split(',') if v.strip()]
+                    except ValueError:
+                        log.warning('Invalid price level "{}" in {}!'.format(line.strip(), path))
+
+        with self.lock:
+            # Replace the levels of the previous file, keep the ones added at runtime
+            self.alerts = dict((i, a) for i, a in self.alerts.items() if a[2] != 'file')
+            for ticker, values in levels.items():
+                for level in values:
+                    self.alerts[self.next_id] = (ticker, level, 'file')
+                    self.next_id += 1
+            # Sort each ticker's levels once instead of inserting them one by one
+            self.tickers = {}
+            for alert_id, (ticker, level, _) in self.alerts.items():
+                self.tickers.setdefault(ticker, []).append((level, alert_id))
+            for ticker_levels in self.tickers.values():
+                ticker_levels.sort()
+        self.path = path
+        self.mtime = mtime
+        log.info('Loaded {} price levels from {}'.format(sum(len(v) for v in levels.values()), path))
@@ -0,0 +1,190 @@
+#!/usr/bin/python
+'''This program load tests the monitor against the local exchange simulator.
+
+The exchange threads from api.py are started the same way as my_monitor.py
+does, but pointed to the simulator and with emails disabled.  Price jumps are
+injected at a fixed interval and the time until each exchange raises the
+alert is measured.
+
+Usage:
+    $ ./loadtest.py --tickers 2000 --duration 60 --jump-interval 5
+
+Reported:
+    polls/s          sustained successful polls per second for each exchange
+    poll time        average time spent fetching and ingesting one poll
+    detection        latency from the injected price jump to the alert
+    cpu, max rss     resource use of the whole process
+'''
+import argparse
+import logging
+import os
+import resource
+import shutil
+import sys
+import tempfile
+import time
+
+# Include the project package into the system path to allow import
+package_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, package_path)
+
+# Import your package (if any) below
+import api
+import simulator
+
+log = logging.getLogger(__name__)
+
+
+def instrument(cls):
+    '''Subclass an exchange class to record polls and alerts instead of sending emails'''
+    class Instrumented(cls):
+        def __init__(self, *args, **kwargs):
+            self.polls = 0
+            self.poll_time = 0.0
+            self.alerts = []
+            super(Instrumented, self).__init__(*args, **kwargs)
+
+        def get_prices(self, my_tickers=None):
+            start = time.time()
+            result = super(Instrumented, self).get_prices(my_tickers)
+            self.poll_time += time.time() - start
+            self.polls += 1
+            return result
+
+        def compose_message(self, ticker, *args, **kwargs):
+            self.alerts.append((ticker, time.time()))
+            return super(Instrumented, self).compose_message(ticker, *args, **kwargs)
+
+        def notify(self, email_content):
+            pass
+
+    # The exchange name, and so the .ini file, comes from the class name
+    Instrumented.__name__ = cls.__name__
+    return Instrumented
+
+
+def percentile(values, percent):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100.0))]
+
+
+def detection_latencies(thread, jumps):
+    '''Latency of the first alert after each jump, and the number of jumps missed
+
+    param: thread: instrumented exchange thread
+    param: jumps: list of (ticker name, jump time)
+    '''
+    latencies = []
+    missed = 0
+    for name, jump_time in jumps:
+        ticker = simulator.symbol(thread.exchange, name)
+        alert_times = [t for a, t in thread.alerts if a == ticker and t >= jump_time]
+        if alert_times:
+            latencies.append(min(alert_times) - jump_time)
+        else:
+            missed += 1
+    return latencies, missed
+
+
+def write_config(exchange, args):
+    with open('{}.ini'.format(exchange), 'w') as f:
+        f.write('email=\n')
+        f.write('percent_limit={}\n'.format(args.percent_limit))
+        f.write('time_limit=0\n')
+        f.write('logging_level=WARNING\n')
+        f.write('my_tickers=\n')
+        f.write('wait_before_poll={}\n'.format(args.wait_before_poll))
+        f.write('verbose=False\n')
+        f.write('detector={}\n'.format(args.detector))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Load test the monitor against the local exchange simulator.')
+    parser.add_argument('--exchanges', default='Binance,Bittrex,Idex', help='comma separated exchange classes to run')
+    parser.add_argument('--tickers', type=int, default=1000, help='number of tickers on every exchange')
+    parser.add_argument('--duration', type=float, default=60, help='seconds to run the load test')
+    parser.add_argument('--jump-interval', type=float, default=5, help='seconds between injected price jumps')
+    parser.add_argument('--jump-percent', type=float, default=50, help='size of the injected price jumps in percent')
+    parser.add_argument('--process', choices=['walk', 'revert', 'flat'], default='walk', help='price process')
+    parser.add_argument('--volatility', type=float, default=0.001, help='standard deviation of the log price move per second')
+    parser.add_argument('--latency', type=float, default=0, help='delay in seconds before each response')
+    parser.add_argument('--jitter', type=float, default=0, help='random deviation in seconds from latency')
+    parser.add_argument('--error-rate', type=float, default=0, help='fraction of requests answered with an HTTP error')
+    parser.add_argument('--truncate-rate', type=float, default=0, help='fraction of responses cut in half')
+    parser.add_argument('--percent-limit', type=float, default=30, help='percent_limit written to the .ini files')
+    parser.add_argument('--wait-before-poll', type=int, default=0, help='wait_before_poll written to the .ini files')
+    parser.add_argument('--detector', choices=['percent', 'zscore'], default='percent', help='detector written to the .ini files')
+    parser.add_argument('--number-of-prices-to-track', type=int, default=300)
+    parser.add_argument('--seed', type=int, default=None)
+    return parser.parse_args(argv)
+
+
+def main():
+    logging.basicConfig(level=logging.WARNING)
+    args = parse_args()
+
+    market = simulator.Market(args.tickers, args.process, args.volatility, seed=args.seed)
+    server = simulator.Simulator(market, port=0, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, truncate_rate=args.truncate_rate, seed=args.seed)
+    server.start()
+    urls = server.urls()
+
+    # Run in a scratch directory since the exchange threads read and write their .ini files there
+    cwd = os.getcwd()
+    work_dir = tempfile.mkdtemp(prefix='loadtest_')
+    os.chdir(work_dir)
+
+    threads = []
+    jumps = []
+    rusage_start = resource.getrusage(resource.RUSAGE_SELF)
+    start = time.time()
+    try:
+        for exchange in [e.strip() for e in args.exchanges.split(',')]:
+            write_config(exchange, args)
+            threads.append(instrument(getattr(api, exchange))(url=urls[exchange], number_of_prices_to_track=args.number_of_prices_to_track))
+
+        for t in threads:
+            t.start()
+
+        next_jump = start + args.jump_interval
+        while time.time() - start < args.duration:
+            if time.time() >= next_jump:
+                name = market.jump(percent=args.jump_percent)
+                jumps.append((name, market.jumps[name]))
+                next_jump += args.jump_interval
+            time.sleep(.01)
+
+        # Let the last jump be picked up before stopping
+        time.sleep(min(args.jump_interval, args.wait_before_poll + 1))
+    except KeyboardInterrupt:
+        print('Ctrl-C entered.')
+    finally:
+        for t in threads:
+            t.stop = True
+        for t in threads:
+            t.join()
+        elapsed = time.time() - start
+        rusage_end = resource.getrusage(resource.RUSAGE_SELF)
+        server.stop()
+        os.chdir(cwd)
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+    print('tickers: {}, duration: {:.1f}s, jumps injected: {}'.format(args.tickers, elapsed, len(jumps)))
+    for t in threads:
+        counters = server.counters.get(t.exchange, {'requests': 0, 'errors': 0, 'truncated': 0})
+        latencies, missed = detection_latencies(t, jumps)
+        print('{}: {:.2f} polls/s, poll time {:.3f}s, requests {}, errors {}, truncated {}'.format(
+            t.exchange, t.polls / elapsed, t.poll_time / t.polls if t.polls else float('nan'),
+            counters['requests'], counters['errors'], counters['truncated']))
+        print('{}: detection p50 {:.3f}s, p95 {:.3f}s, max {:.3f}s, missed {}, alerts {}'.format(
+            t.exchange, percentile(latencies, 50), percentile(latencies, 95),
+            max(latencies) if latencies else float('nan'), missed, len(t.alerts)))
+
+    cpu = (rusage_end.ru_utime - rusage_start.ru_utime) + (rusage_end.ru_stime - rusage_start.ru_stime)
+    print('cpu: {:.1f}s ({:.0f}% of one core), max rss: {:.1f}MB, threads: {}'.format(
+        cpu, cpu / elapsed * 100, rusage_end.ru_maxrss / 1024.0, len(threads)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+'''This module keeps the tickers of an exchange ranked by their percent change
+over a time window, so the top gainers and losers can be answered without
+sorting the whole universe of tickers.
+
+The ranking is a list kept sorted with bisect.  Only the tickers whose price
+changed in a poll are updated, an update costs a binary search plus a memmove
+of the list, and the top N gainers or losers is a slice of N entries.
+
+The percent change is measured from the oldest price still in the window.
+Each index also keeps a heap of the time that price leaves the window, so a
+ticker which stopped trading is recomputed when the window slides past its
+old prices, instead of keeping a stale move in the ranking.
+
+Reference: https://docs.python.org/2/library/bisect.html
+Reference: https://docs.python.org/2/library/heapq.html
+'''
+import bisect
+import datetime
+import heapq
+import itertools
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class MoversIndex(object):
+    def __init__(self, window=0):
+        '''
+        param: window: window in seconds, 0 means the whole history and never expires
+        '''
+        self.window = window
+        # Sorted list of (percent change, ticker)
+        self.ranking = []
+        self.percent_changes = {}
+
+        # Heap of (expiry time, ticker), an entry is stale when it no longer matches expiries
+        self.expiry_heap = []
+        self.expiries = {}
+
+    def __len__(self):
+        return len(self.ranking)
+
+    def update(self, ticker, percent_change, start_time=None):
+        '''
+        param: ticker: ticker to rank
+        param: percent_change: percent change over the window
+        param: start_time: time of the oldest price in the window, the entry expires when it leaves the window
+        '''
+        if self.window and start_time is not None:
+            expiry = start_time + datetime.timedelta(seconds=self.window)
+            if self.expiries.get(ticker) != expiry:
+                self.expiries[ticker] = expiry
+                heapq.heappush(self.expiry_heap, (expiry, ticker))
+                # Drop the stale entries once they outnumber the live ones
+                if len(self.expiry_heap) > 2 * len(self.expiries) + 64:
+                    self.expiry_heap = [(e, t) for t, e in self.expiries.items()]
+                    heapq.heapify(self.expiry_heap)
+
+        old_percent_change = self.percent_changes.get(ticker)
+        if old_percent_change == percent_change:
+            return
+        if old_percent_change is not None:
+            del self.ranking[bisect.bisect_left(self.ranking, (old_percent_change, ticker))]
+        bisect.insort(self.ranking, (percent_change, ticker))
+        self.percent_changes[ticker] = percent_change
+
+    def remove(self, ticker):
+        self.expiries.pop(ticker, None)
+        old_percent_change = self.percent_changes.pop(ticker, None)
+        if old_percent_change is not None:
+            del self.ranking[bisect.bisect_left(self.ranking, (old_percent_change, ticker))]
+
+    def expired(self, now):
+        '''Tickers whose oldest price in the window has left the window by now'''
+        tickers = []
+        while self.expiry_heap and self.expiry_heap[0][0] <= now:
+            expiry, ticker = heapq.heappop(self.expiry_heap)
+            if self.expiries.get(ticker) == expiry:
+                del self.expiries[ticker]
+                tickers.append(ticker)
+        return tickers
+
+    def gainers(self, n):
+        '''Top n tickers with a positive percent change, biggest gain first'''
+        result = []
+        for percent_change, ticker in reversed(self.ranking[-n:] if n > 0 else []):
+            if percent_change <= 0:
+                break
+            result.append((ticker, percent_change))
+        return result
+
+    def losers(self, n):
+        '''Top n tickers with a negative percent change, biggest loss first'''
+        result = []
+        for percent_change, ticker in self.ranking[:n] if n > 0 else []:
+            if percent_change >= 0:
+                break
+            result.append((ticker, percent_change))
+        return result
+
+
+def window_start_prices(prices, times, now, windows):
+    '''Oldest price within each window, walking back from the newest price
+
+    param: prices: price history of a ticker, oldest first
+    param: times: time of each price
+    param: now: end time of the windows
+    param: windows: list of windows in seconds, 0 means the whole history
+    return: dictionary of window and (start price, start time), (None, None) if no price is in the window
+    '''
+    result = {}
+    pending = sorted(windows, key=lambda w: w or float('inf'))
+    start = (None, None)
+    i = 0
+    for price, time in itertools.izip(reversed(prices), reversed(times)):
+        while i < len(pending) and pending[i] and now - time > datetime.timedelta(seconds=pending[i]):
+            result[pending[i]] = start
+            i += 1
+        if i == len(pending):
+            break
+        start = (price, time)
+    for w in pending[i:]:
+        result[w] = start
+    return result
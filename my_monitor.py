@@ -14,6 +14,13 @@ Usage:
      1828 pts/8    00:00:00 my_monitor.py
     $ kill -9 1828
 
+    Query the live price history (set CRYPTO_QUERY_PORT in the .bashrc first)
+    $ curl http://127.0.0.1:8080/exchanges
+
+    Profile the running program, results are written to the logs directory
+    $ kill -USR1 1828    # sample the stacks of every thread for 30s
+    $ kill -USR2 1828    # allocation snapshot
+
 TODO: Add to start/stop thread without having to start/stop my_monitor.
 TODO: Figure out why it takes so long (> 2 mins) for email to be sent.
 '''
@@ -30,6 +37,8 @@ sys.path.insert(0, package_path)
 # Import your package (if any) below
 import api
 import lib.util
+import profiler
+import query
 
 log = logging.getLogger(__name__)
 this_filename = os.path.basename(__file__).split('.')[0]
@@ -40,9 +49,10 @@ def main():
     # filename = '{}/{}_{}.log'.format(log_dir, this_filename, datetime.datetime.now().isoformat().replace(':', '').replace('-', '').replace('.', ''))
     lib.util.log_to_file(log_dir='logs', maxBytes=10*1024*1024, backupCount=5)  # 10*1024*1024 = 10MB
     
+    threads = []
+    query_server = None
     try:
         log.info('{0} started as PID {1}...'.format(this_filename, os.getpid()))
-        threads = []
         threads.append(api.Binance(number_of_prices_to_track=300))
         threads.append(api.Bittrex(number_of_prices_to_track=300))
         threads.append(api.Idex(number_of_prices_to_track=300))
@@ -52,6 +62,15 @@ def main():
         for t in threads:
             t.start()
 
+        # Start the read-only query service if a port is set in the environmental variables
+        query_port = os.environ.get('CRYPTO_QUERY_PORT')
+        if query_port:
+            query_server = query.QueryServer(threads, port=int(query_port))
+            query_server.start()
+
+        # Profile on SIGUSR1 and SIGUSR2, see profiler.py
+        profiler.install(threads, log_dir='logs')
+
         # Monitor child threads in case exceptions happen
         old_time = datetime.datetime.now()
         while True:
@@ -86,6 +105,9 @@ def main():
         log.info('Stopping all threads!')
         print('Stopping all threads!')
 
+        if query_server:
+            query_server.stop()
+
         # Stop and wait for threads to finish
         for t in threads:
             t.stop = True
@@ -0,0 +1,240 @@
+'''This module profiles the running monitor on demand, without restarting it.
+
+    SIGUSR1     sample the stacks of every thread for a while, then write the
+                profile per thread and per stage of the exchange threads
+    SIGUSR2     write an allocation snapshot
+
+Both signals also write the current stack of every thread.  The work is done
+on a background thread, an error is logged and never raised into the code the
+signal interrupted.  All files are written under the logs directory with a
+timestamp in the name:
+
+    profile_<timestamp>.txt         samples per stage and top stacks per thread
+    profile_<timestamp>.folded      folded stacks, e.g. for flamegraph.pl
+    memory_<timestamp>.txt          allocations, and price history size per exchange
+    stacks_<timestamp>.txt          stack of every thread
+
+Usage:
+    $ kill -USR1 <pid of my_monitor.py>
+
+The functions start_profile, snapshot_memory and dump_stacks can also be
+called directly.  tracemalloc is used for the allocation snapshot when it is
+available (started on the first SIGUSR2), otherwise the live objects are
+counted by type.
+
+Reference: https://docs.python.org/2/library/signal.html
+Reference: https://github.com/brendangregg/FlameGraph
+'''
+import collections
+import datetime
+import gc
+import logging
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+# Include the project package into the system path to allow import
+package_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, package_path)
+
+# Import your package (if any) below
+
+log = logging.getLogger(__name__)
+
+# Settings passed to install
+settings = {'threads': [], 'log_dir': 'logs', 'duration': 30, 'interval': 0.01}
+# Held while a profile is running, only one sampler at a time
+profiling = threading.Lock()
+previous_type_counts = {}
+
+
+def install(threads, log_dir='logs', duration=30, interval=0.01):
+    '''Install the signal handlers, must be called from the main thread
+
+    param: threads: exchange threads from api.py, used to report their stage and price history size
+    param: log_dir: directory to write the files to
+    param: duration: time (in seconds) to sample the stacks for on SIGUSR1
+    param: interval: time (in seconds) between two stack samples
+    '''
+    settings.update(threads=threads, log_dir=log_dir, duration=duration, interval=interval)
+    signal.signal(signal.SIGUSR1, lambda signum, frame: in_background(start_profile))
+    signal.signal(signal.SIGUSR2, lambda signum, frame: in_background(snapshot_memory))
+    log.info('Profiling hooks installed, SIGUSR1 to profile for {}s, SIGUSR2 for an allocation snapshot'.format(duration))
+
+
+def in_background(target):
+    '''Run target on a daemon thread, used by the signal handlers
+
+    Nothing is raised from here, an exception in a signal handler would
+    surface in the interrupted main thread and stop the monitor.
+    '''
+    try:
+        t = threading.Thread(target=log_errors, args=(target,), name='Profiler')
+        t.daemon = True
+        t.start()
+    except Exception as e:
+        log.warning('Unable to start profiling thread!')
+        log.exception(e)
+
+
+def log_errors(target):
+    try:
+        target()
+    except Exception as e:
+        log.warning('Unable to profile!')
+        log.exception(e)
+
+
+def new_timestamp():
+    return datetime.datetime.now().isoformat().replace(':', '').replace('-', '').replace('.', '')
+
+
+def file_path(prefix, extension='txt', timestamp=None):
+    '''
+    param: timestamp: timestamp in the file name, pass the same one to group the files of one profile
+    '''
+    if not os.path.exists(settings['log_dir']):
+        os.makedirs(settings['log_dir'])
+    timestamp = timestamp or new_timestamp()
+    return os.path.join(settings['log_dir'], '{}_{}.{}'.format(prefix, timestamp, extension))
+
+
+def thread_names():
+    return dict((t.ident, t.name) for t in threading.enumerate())
+
+
+def dump_stacks():
+    '''Write the current stack of every thread'''
+    path = file_path('stacks')
+    names = thread_names()
+    stages = dict((t.ident, t.stage) for t in settings['threads'])
+    with open(path, 'w') as f:
+        for ident, frame in sys._current_frames().items():
+            f.write('Thread {} ({})'.format(names.get(ident, '?'), ident))
+            if ident in stages:
+                f.write(', stage: {}'.format(stages[ident]))
+            f.write('\n')
+            f.write(''.join(traceback.format_stack(frame)))
+            f.write('\n')
+    log.info('Stacks written to {}'.format(path))
+    return path
+
+
+def start_profile(duration=None):
+    '''Sample the stacks of every thread in the background for duration seconds
+
+    param: duration: time (in seconds) to sample for, the installed duration if None
+    '''
+    dump_stacks()
+    if not profiling.acquire(False):
+        log.warning('Profile already running, ignored')
+        return
+    try:
+        t = threading.Thread(target=profile, args=(duration or settings['duration'], settings['interval']), name='Profiler')
+        t.daemon = True
+        t.start()
+    except Exception:
+        # profile never ran to release it
+        profiling.release()
+        raise
+
+
+def profile(duration, interval):
+    try:
+        log.info('Profiling for {}s...'.format(duration))
+        me = threading.current_thread().ident
+        exchanges = dict((t.ident, t) for t in settings['threads'])
+        samples = collections.Counter()
+        stages = collections.defaultdict(collections.Counter)
+        stacks = collections.defaultdict(collections.Counter)
+        names = thread_names()
+
+        end = time.time() + duration
+        while time.time() < end:
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                if ident not in names:
+                    names = thread_names()
+                name = names.get(ident, str(ident))
+                samples[name] += 1
+                if ident in exchanges:
+                    stages[name][exchanges[ident].stage] += 1
+                stack = []
+                while frame is not None:
+                    stack.append('{}:{}'.format(os.path.basename(frame.f_code.co_filename), frame.f_code.co_name))
+                    frame = frame.f_back
+                stacks[name][';'.join(reversed(stack))] += 1
+            time.sleep(interval)
+
+        timestamp = new_timestamp()
+        path = file_path('profile', timestamp=timestamp)
+        with open(path, 'w') as f:
+            f.write('Profile of {}s, one sample every {}s\n'.format(duration, interval))
+            for name, count in samples.most_common():
+                f.write('\n==========\n')
+                f.write('Thread {}: {} samples\n'.format(name, count))
+                if name in stages:
+                    for stage, n in stages[name].most_common():
+                        f.write('    stage {:<12} {:6.1f}%\n'.format(stage, n * 100.0 / count))
+                f.write('Top stacks:\n')
+                for stack, n in stacks[name].most_common(10):
+                    f.write('    {:6.1f}% {}\n'.format(n * 100.0 / count, stack.split(';')[-1]))
+                    f.write('           {}\n'.format(stack))
+        folded_path = file_path('profile', 'folded', timestamp)
+        with open(folded_path, 'w') as f:
+            for name in stacks:
+                for stack, n in stacks[name].items():
+                    f.write('{};{} {}\n'.format(name, stack, n))
+        log.info('Profile written to {} and {}'.format(path, folded_path))
+    except Exception as e:
+        log.warning('Unable to profile!')
+        log.exception(e)
+    finally:
+        profiling.release()
+
+
+def snapshot_memory():
+    '''Write an allocation snapshot and the price history size per exchange'''
+    dump_stacks()
+    path = file_path('memory')
+    with open(path, 'w') as f:
+        f.write('Price history per exchange\n')
+        for t in settings['threads']:
+            # Read the published snapshot, the price history itself is being mutated by the thread
+            tickers = t.snapshot.tickers
+            prices = sum(len(w.prices) for w in tickers.values())
+            f.write('    {}: {} tickers, {} prices, stage: {}\n'.format(t.exchange, len(tickers), prices, t.stage))
+            # The thread may stop or replace its feed meanwhile
+            feed = t.feed
+            if feed:
+                subscribers = feed.subscribers.values()
+                buffered = sum(len(s.buffer) for s in subscribers)
+                f.write('    {}: {} feed subscribers, {} messages buffered\n'.format(t.exchange, len(subscribers), buffered))
+
+        if tracemalloc and not tracemalloc.is_tracing():
+            # Tracing only starts now, send the signal again for a snapshot
+            tracemalloc.start()
+            f.write('\nStarted tracemalloc, send SIGUSR2 again to get the allocations\n')
+        elif tracemalloc:
+            f.write('\nTop allocations by line (tracemalloc)\n')
+            for stat in tracemalloc.take_snapshot().statistics('lineno')[:50]:
+                f.write('    {}\n'.format(stat))
+        else:
+            # Count the live objects by type, and the change since the previous snapshot
+            global previous_type_counts
+            counts = collections.Counter(type(o).__name__ for o in gc.get_objects())
+            f.write('\nLive objects by type, {} objects tracked by gc\n'.format(sum(counts.values())))
+            for name, count in counts.most_common(50):
+                f.write('    {:<30} {:>10} {:>+10}\n'.format(name, count, count - previous_type_counts.get(name, 0)))
+            previous_type_counts = counts
+    log.info('Allocation snapshot written to {}'.format(path))
+    return path
@@ -0,0 +1,125 @@
+'''This module serves a read-only HTTP/JSON query API over the live price
+history of the running exchange threads.
+
+Requests are answered from the immutable snapshot each exchange thread
+publishes after every poll, the query threads never touch the price history
+being ingested and never take a lock on it.
+
+Endpoints:
+    /exchanges                          exchanges with snapshot time and number of tickers
+    /<exchange>/prices                  latest price of every ticker
+    /<exchange>/stats                   window stats of every ticker
+    /<exchange>/tickers/<ticker>        price window of one ticker
+
+Usage:
+    Set CRYPTO_QUERY_PORT in the .bashrc to start the service from my_monitor.py
+    $ curl http://127.0.0.1:8080/Binance/tickers/XRPETH
+
+Reference: https://docs.python.org/2/library/basehttpserver.html
+'''
+import BaseHTTPServer
+import json
+import logging
+import os
+import SocketServer
+import sys
+import threading
+
+# Include the project package into the system path to allow import
+package_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, package_path)
+
+# Import your package (if any) below
+
+log = logging.getLogger(__name__)
+
+
+def to_time(t):
+    return t.isoformat() if t else None
+
+
+def window_stats(window):
+    return {
+        'count': len(window.prices),
+        'last': window.prices[-1] if window.prices else None,
+        'last_time': to_time(window.times[-1]) if window.times else None,
+        'min': window.min,
+        'max': window.max,
+        'percent_change': window.percent_change,
+        'zscore': window.zscore,
+        'ewma_zscore': window.ewma_zscore,
+        'volume': window.volume,
+    }
+
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    def do_GET(self):
+        parts = [p for p in self.path.split('?')[0].split('/') if p]
+
+        if parts == ['exchanges']:
+            result = []
+            for name, thread in sorted(self.server.exchanges.items()):
+                snapshot = thread.snapshot
+                result.append({'exchange': name, 'time': to_time(snapshot.time), 'tickers': len(snapshot.tickers)})
+            self.send_json(result)
+            return
+
+        if not parts or parts[0] not in self.server.exchanges:
+            self.send_error(404, 'Unknown exchange')
+            return
+
+        # Take the snapshot once, everything below reads from the same poll
+        snapshot = self.server.exchanges[parts[0]].snapshot
+
+        if parts[1:] == ['prices']:
+            self.send_json(dict((t, w.prices[-1]) for t, w in snapshot.tickers.items() if w.prices))
+        elif parts[1:] == ['stats']:
+            self.send_json(dict((t, window_stats(w)) for t, w in snapshot.tickers.items()))
+        elif len(parts) == 3 and parts[1] == 'tickers':
+            window = snapshot.tickers.get(parts[2])
+            if window is None:
+                self.send_error(404, 'Unknown ticker')
+                return
+            result = window_stats(window)
+            result['prices'] = list(window.prices)
+            result['times'] = [to_time(t) for t in window.times]
+            self.send_json(result)
+        else:
+            self.send_error(404)
+
+    def send_json(self, result):
+        body = json.dumps(result)
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        log.debug(format % args)
+
+
+class QueryServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, threads, host='127.0.0.1', port=8080):
+        '''
+        param: threads: exchange threads from api.py to serve
+        param: host: address to listen on, only local by default
+        param: port: port to listen on
+        '''
+        self.exchanges = dict((t.exchange, t) for t in threads)
+        BaseHTTPServer.HTTPServer.__init__(self, (host, port), Handler)
+
+    def start(self):
+        '''Serve in a background thread'''
+        t = threading.Thread(target=self.serve_forever, name='QueryServer')
+        t.daemon = True
+        t.start()
+        log.info('Query service listening on {}:{}'.format(*self.server_address))
+        return t
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,345 @@
+#!/usr/bin/python
+'''This program simulates the crypto exchanges locally so the monitor can be
+load tested without hitting the real exchanges.  It serves the same endpoints
+used by the classes in api.py with the same payload shapes, all the
+exchanges share one simulated market.
+
+Usage:
+    $ ./simulator.py --port 8000 --tickers 1000 --latency 0.2 --error-rate 0.01
+
+    Then point the exchange classes to the simulator, e.g.
+    api.Binance(url='http://127.0.0.1:8000/api/v1/ticker/allPrices')
+
+Price processes:
+    walk    geometric random walk
+    revert  mean reverting walk around the initial price
+    flat    prices never change unless a jump is injected
+
+Reference: https://docs.python.org/2/library/basehttpserver.html
+'''
+import argparse
+import BaseHTTPServer
+import datetime
+import json
+import logging
+import math
+import os
+import random
+import SocketServer
+import sys
+import threading
+import time
+
+# Include the project package into the system path to allow import
+package_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, package_path)
+
+# Import your package (if any) below
+
+log = logging.getLogger(__name__)
+
+# Endpoint served for each exchange class in api.py
+PATHS = {
+    'Binance': '/api/v1/ticker/allPrices',
+    'Bittrex': '/api/v1.1/public/getmarketsummaries',
+    'Idex': '/returnTicker',
+    'Kucoin': '/v1/open/tick',
+}
+
+
+def symbol(exchange, name):
+    '''Ticker name as displayed by the exchange
+
+    param: exchange: name of the exchange class in api.py
+    param: name: ticker name in the simulated market
+    '''
+    if exchange == 'Binance':
+        return '{}ETH'.format(name)
+    elif exchange == 'Bittrex':
+        return 'ETH-{}'.format(name)
+    elif exchange == 'Idex':
+        return 'ETH_{}'.format(name)
+    elif exchange == 'Kucoin':
+        return '{}-ETH'.format(name)
+    return name
+
+
+class Market(object):
+    def __init__(self, number_of_tickers=100, process='walk', volatility=0.001, burst_rate=0, burst_percent=50, seed=None):
+        '''
+        param: number_of_tickers: number of tickers listed on every exchange
+        param: process: price process, "walk", "revert" or "flat"
+        param: volatility: standard deviation of the log price move per second
+        param: burst_rate: average number of random price jumps per second across the market
+        param: burst_percent: size (in percent) of the random price jumps
+        param: seed: seed of the random generator to repeat a run
+        '''
+        self.random = random.Random(seed)
+        self.process = process
+        self.volatility = volatility
+        self.burst_rate = burst_rate
+        self.burst_percent = burst_percent
+        self.names = ['T{:05d}'.format(i) for i in range(number_of_tickers)]
+        self.initial_prices = [self.random.uniform(0.0001, 1) for _ in self.names]
+        self.prices = list(self.initial_prices)
+        self.volumes = [self.random.uniform(10, 10000) for _ in self.names]
+
+        # Time of the latest injected jump for each ticker name
+        self.jumps = {}
+
+        self.lock = threading.Lock()
+        self.last_time = time.time()
+
+    def step(self):
+        '''Move the prices by the time elapsed since the previous step'''
+        with self.lock:
+            now = time.time()
+            dt = now - self.last_time
+            self.last_time = now
+            if dt <= 0:
+                return
+
+            sigma = self.volatility * math.sqrt(dt)
+            if self.process == 'walk':
+                for i, price in enumerate(self.prices):
+                    self.prices[i] = price * math.exp(self.random.gauss(0, sigma))
+            elif self.process == 'revert':
+                # Pull back 10% of the distance to the initial price every second
+                pull = min(0.1 * dt, 1)
+                for i, price in enumerate(self.prices):
+                    x = math.log(price)
+                    x += pull * (math.log(self.initial_prices[i]) - x) + self.random.gauss(0, sigma)
+                    self.prices[i] = math.exp(x)
+
+            for i, volume in enumerate(self.volumes):
+                self.volumes[i] = volume * math.exp(self.random.gauss(0, sigma))
+
+            # Random bursts across the market
+            if self.burst_rate:
+                bursts = int(self.burst_rate * dt) + (1 if self.random.random() < self.burst_rate * dt % 1 else 0)
+                for _ in range(bursts):
+                    percent = self.random.choice([1, -1]) * self.burst_percent
+                    self._jump(self.random.randrange(len(self.names)), percent, now)
+
+    def jump(self, name=None, percent=50):
+        '''Inject a price jump and return the name of the ticker that jumped
+
+        param: name: ticker name in the simulated market, a random ticker if None
+        param: percent: size of the jump in percent, negative for a drop
+        '''
+        with self.lock:
+            if name is None:
+                i = self.random.randrange(len(self.names))
+            else:
+                i = self.names.index(name)
+            self._jump(i, percent, time.time())
+            return self.names[i]
+
+    def _jump(self, i, percent, now):
+        self.prices[i] *= 1 + percent / 100.0
+        self.jumps[self.names[i]] = now
+
+    def payload(self, exchange):
+        '''Ticker payload in the same shape as the exchange's API
+
+        param: exchange: name of the exchange class in api.py
+        '''
+        self.step()
+        with self.lock:
+            rows = zip(self.names, self.prices, self.volumes)
+
+        if exchange == 'Binance':
+            return [{'symbol': symbol(exchange, n), 'price': '{:.8f}'.format(p)} for n, p, v in rows]
+        elif exchange == 'Bittrex':
+            timestamp = datetime.datetime.utcnow().isoformat()
+            return {
+                'success': True,
+                'message': '',
+                'result': [{
+                    'MarketName': symbol(exchange, n),
+                    'High': round(p * 1.05, 8),
+                    'Low': round(p * 0.95, 8),
+                    'Volume': round(v / p, 8),
+                    'Last': round(p, 8),
+                    'BaseVolume': round(v, 8),
+                    'TimeStamp': timestamp,
+                    'Bid': round(p * 0.999, 8),
+                    'Ask': round(p * 1.001, 8),
+                    'OpenBuyOrders': 100,
+                    'OpenSellOrders': 100,
+                    'PrevDay': round(p, 8),
+                    'Created': '2017-01-01T00:00:00'} for n, p, v in rows]
+            }
+        elif exchange == 'Idex':
+            return dict((symbol(exchange, n), {
+                'last': '{:.8f}'.format(p),
+                'high': '{:.8f}'.format(p * 1.05),
+                'low': '{:.8f}'.format(p * 0.95),
+                'lowestAsk': '{:.8f}'.format(p * 1.001),
+                'highestBid': '{:.8f}'.format(p * 0.999),
+                'percentChange': '0',
+                'baseVolume': '{:.8f}'.format(v),
+                'quoteVolume': '{:.8f}'.format(v / p)}) for n, p, v in rows)
+        elif exchange == 'Kucoin':
+            timestamp = int(time.time() * 1000)
+            return {
+                'success': True,
+                'code': 'OK',
+                'msg': 'Operation succeeded.',
+                'timestamp': timestamp,
+                'data': [{
+                    'coinType': n,
+                    'trading': True,
+                    'symbol': symbol(exchange, n),
+                    'lastDealPrice': round(p, 8),
+                    'buy': round(p * 0.999, 8),
+                    'sell': round(p * 1.001, 8),
+                    'change': 0,
+                    'coinTypePair': 'ETH',
+                    'sort': 100,
+                    'feeRate': 0.001,
+                    'volValue': round(v, 8),
+                    'high': round(p * 1.05, 8),
+                    'low': round(p * 0.95, 8),
+                    'vol': round(v / p, 8),
+                    'datetime': timestamp,
+                    'changeRate': 0} for n, p, v in rows]
+            }
+        raise ValueError('Unknown exchange {}'.format(exchange))
+
+
+class Handler(BaseHTTPServer.BaseHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        path = self.path.split('?')[0]
+        exchanges = [e for e, p in PATHS.items() if p == path]
+        if not exchanges:
+            self.send_error(404)
+            return
+        exchange = exchanges[0]
+        server.count(exchange, 'requests')
+
+        delay, error, truncate = server.faults()
+
+        # Injected latency
+        if delay:
+            time.sleep(delay)
+
+        # Injected errors
+        if error:
+            server.count(exchange, 'errors')
+            self.send_error(error)
+            return
+
+        body = json.dumps(server.market.payload(exchange))
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+
+        # Injected truncated responses, the client sees an incomplete read
+        if truncate:
+            server.count(exchange, 'truncated')
+            body = body[:len(body) / 2]
+            self.close_connection = 1
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        log.debug(format % args)
+
+
+class Simulator(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, market, host='127.0.0.1', port=8000, latency=0, jitter=0, error_rate=0, truncate_rate=0, seed=None):
+        '''
+        param: market: the simulated market shared by all exchanges
+        param: host: address to listen on
+        param: port: port to listen on, 0 to pick a free port
+        param: latency: average delay (in seconds) before each response
+        param: jitter: maximum random deviation (in seconds) from latency
+        param: error_rate: fraction of the requests answered with an HTTP error
+        param: truncate_rate: fraction of the responses cut in half
+        param: seed: seed of the random generator of the latency, errors and truncations to repeat a run
+        '''
+        self.market = market
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.truncate_rate = truncate_rate
+        self.random = random.Random(seed)
+        self.random_lock = threading.Lock()
+        self.counters = {}
+        self.counters_lock = threading.Lock()
+        BaseHTTPServer.HTTPServer.__init__(self, (host, port), Handler)
+
+    def faults(self):
+        '''Latency, HTTP error (None if no error) and truncation injected in the next response
+
+        The same number of values is drawn for every request, so a seeded run
+        repeats its pattern whatever the outcome of each request.
+        '''
+        with self.random_lock:
+            jitter = self.random.uniform(-self.jitter, self.jitter)
+            error = self.random.random() < self.error_rate
+            code = self.random.choice([429, 500, 502, 503])
+            truncate = self.random.random() < self.truncate_rate
+        return max(0, self.latency + jitter), code if error else None, truncate
+
+    def count(self, exchange, counter):
+        with self.counters_lock:
+            counters = self.counters.setdefault(exchange, {'requests': 0, 'errors': 0, 'truncated': 0})
+            counters[counter] += 1
+
+    def urls(self):
+        '''URL of each exchange to pass to the classes in api.py'''
+        host, port = self.server_address
+        return dict((e, 'http://{}:{}{}'.format(host, port, p)) for e, p in PATHS.items())
+
+    def start(self):
+        '''Serve in a background thread'''
+        t = threading.Thread(target=self.serve_forever, name='Simulator')
+        t.daemon = True
+        t.start()
+        return t
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Simulate the crypto exchanges locally.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--tickers', type=int, default=100, help='number of tickers on every exchange')
+    parser.add_argument('--process', choices=['walk', 'revert', 'flat'], default='walk', help='price process')
+    parser.add_argument('--volatility', type=float, default=0.001, help='standard deviation of the log price move per second')
+    parser.add_argument('--burst-rate', type=float, default=0, help='random price jumps per second across the market')
+    parser.add_argument('--burst-percent', type=float, default=50, help='size of the random price jumps in percent')
+    parser.add_argument('--latency', type=float, default=0, help='delay in seconds before each response')
+    parser.add_argument('--jitter', type=float, default=0, help='random deviation in seconds from latency')
+    parser.add_argument('--error-rate', type=float, default=0, help='fraction of requests answered with an HTTP error')
+    parser.add_argument('--truncate-rate', type=float, default=0, help='fraction of responses cut in half')
+    parser.add_argument('--seed', type=int, default=None)
+    return parser.parse_args(argv)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    args = parse_args()
+    market = Market(args.tickers, args.process, args.volatility, args.burst_rate, args.burst_percent, args.seed)
+    server = Simulator(market, args.host, args.port, args.latency, args.jitter, args.error_rate, args.truncate_rate, args.seed)
+    for exchange, url in sorted(server.urls().items()):
+        print('{}: {}'.format(exchange, url))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print('Ctrl-C entered.')
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    main()